@@ -1,15 +1,109 @@
 import os
 import json
 import re
+import datetime
 from typing import List, Dict, Any
 from dotenv import load_dotenv
 import google.generativeai as genai
 
+from handler._prompts import (
+    GENERATOR_PROMPT_VERSION as PROMPT_VERSION,
+    GENERATOR_STATIC_PROMPT as STATIC_PROMPT,
+    GENERATOR_TAIL_TEMPLATE,
+)
+
+# Compiled once at import; _extract_json runs on every LLM response.
+_JSON_FENCE_RE = re.compile(r"```json\n?|\n```")
+_BAD_ESC_RE = re.compile(r'\\(?!["\\/bfnrtu])')
+_TRAILING_COMMA_RE = re.compile(r',\s*([\}\]])')
+
+
+def _sanitize_json(s: str) -> str:
+    """
+    One linear pass over a candidate JSON string: drops backslashes that don't
+    start a valid escape, turns newlines into spaces, and removes trailing
+    commas before '}' / ']'. Replaces the two regex passes that each re-scanned
+    the whole string with lookahead backtracking.
+    """
+    src = s.encode('utf-8')
+    out = bytearray()
+    in_string = False
+    i = 0
+    n = len(src)
+    while i < n:
+        c = src[i]
+        if c == 0x5C:  # backslash
+            nxt = src[i + 1:i + 2]
+            if nxt and nxt in b'"\\/bfnrtu':
+                out += src[i:i + 2]
+                i += 2
+            else:
+                # Orphan escape the LLM invented — drop the backslash.
+                i += 1
+            continue
+        if c == 0x22:  # unescaped quote
+            in_string = not in_string
+        elif c == 0x0A:  # newline -> space so strings stay single-line
+            out.append(0x20)
+            i += 1
+            continue
+        elif c == 0x2C and not in_string:  # comma: drop if only ws then } / ]
+            j = i + 1
+            while j < n and src[j] in b' \t\r\n':
+                j += 1
+            if j < n and src[j] in b'}]':
+                i += 1
+                continue
+        out.append(c)
+        i += 1
+    return out.decode('utf-8', 'ignore')
+
+
+async def _collect_json_stream(stream) -> str:
+    """
+    Assembles a streamed Gemini response until the top-level JSON object
+    closes, then stops consuming so we never wait for trailing tokens. The
+    brace counter tracks in-string and escape state so braces inside values
+    don't fool it.
+    """
+    parts = []
+    depth = 0
+    in_string = False
+    escaped = False
+    started = False
+    async for chunk in stream:
+        text = chunk.text
+        for i, ch in enumerate(text):
+            if escaped:
+                escaped = False
+                continue
+            if in_string:
+                if ch == '\\':
+                    escaped = True
+                elif ch == '"':
+                    in_string = False
+                continue
+            if ch == '"':
+                in_string = True
+            elif ch == '{':
+                depth += 1
+                started = True
+            elif ch == '}':
+                depth -= 1
+                if started and depth == 0:
+                    parts.append(text[:i + 1])
+                    return "".join(parts)
+        parts.append(text)
+    return "".join(parts)
+
+
 class GeneratorAgent:
     """
     Generates a final, structured JSON answer based on the retrieved document chunks.
     """
     _model = None
+    _cache = None
+    _uses_cache = False
     _initialized = False
 
     def __init__(self):
@@ -19,34 +113,69 @@ class GeneratorAgent:
             if not api_key:
                 raise ValueError("GEMINI_API_KEY not found in environment variables.")
             genai.configure(api_key=api_key)
-            GeneratorAgent._model = genai.GenerativeModel("gemini-2.0-flash-lite")
+            self._setup_model()
             GeneratorAgent._initialized = True
 
+    @classmethod
+    def _setup_model(cls):
+        """
+        Tries to upload the static prompt prefix as Gemini CachedContent so each
+        request only transmits the variable context/query tail. Falls back to the
+        plain model (inline prompt) if cache creation fails.
+        """
+        try:
+            cls._cache = genai.caching.CachedContent.create(
+                model="models/gemini-2.0-flash-lite",
+                display_name=f"generator-prompt-{PROMPT_VERSION}",
+                system_instruction=STATIC_PROMPT,
+                ttl=datetime.timedelta(hours=1),
+            )
+            cls._model = genai.GenerativeModel.from_cached_content(cls._cache)
+            cls._uses_cache = True
+        except Exception as e:
+            print(f"[WARNING] Generator prompt cache creation failed, using inline prompt: {e}")
+            cls._model = genai.GenerativeModel("gemini-2.0-flash-lite")
+            cls._uses_cache = False
+
     @staticmethod
     def _extract_json(text: str) -> dict:
         """
         A more robust function to extract and clean a JSON object from a raw string.
         """
-        # Remove markdown code block fences and leading/trailing whitespace
-        text = re.sub(r"```json\n?|\n```", "", text.strip())
-        
-        # Find the JSON block using the first '{' and the last '}'
-        json_match = re.search(r'\{.*\}', text, re.DOTALL)
-        if not json_match:
+        text = text.strip()
+
+        # Fast path: at temperature 0.1 with our schema the response is usually
+        # already strict JSON, so skip the whole cleanup pipeline.
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError:
+            pass
+
+        # Remove markdown code block fences
+        text = _JSON_FENCE_RE.sub("", text)
+
+        # Find the JSON block using the first '{' and the last '}' — two C-level
+        # scans instead of a DOTALL regex over the whole response.
+        start = text.find('{')
+        end = text.rfind('}')
+        if start == -1 or end < start:
             print(f"⚠️ Failed to find JSON object in text:\n{text}")
             raise ValueError("No valid JSON object found in LLM response.")
-            
-        json_str = json_match.group(0)
-
-        # **FIX 1: Remove invalid backslash escapes that are not part of a valid sequence**
-        # This looks for a backslash that is NOT followed by ", \, /, b, f, n, r, t, or u.
-        json_str = re.sub(r'\\(?!["\\/bfnrtu])', '', json_str)
-        
-        # Replace all newline characters with a space to ensure single-line validity for parsing.
+
+        json_str = text[start:end + 1]
+
+        # Single-pass scanner: fixes bad escapes, newlines-in-strings and
+        # trailing commas in one walk over the bytes.
+        try:
+            return json.loads(_sanitize_json(json_str))
+        except json.JSONDecodeError:
+            pass
+
+        # Fallback: the old regex cleanup, kept in case the scanner ever
+        # mishandles an exotic response.
+        json_str = _BAD_ESC_RE.sub('', json_str)
         json_str = json_str.replace('\n', ' ')
-        
-        # **FIX 2: Remove trailing commas before closing braces or brackets**
-        json_str = re.sub(r',\s*([\}\]])', r'\1', json_str)
+        json_str = _TRAILING_COMMA_RE.sub(r'\1', json_str)
 
         try:
             return json.loads(json_str)
@@ -55,7 +184,42 @@ class GeneratorAgent:
             print(f"Raw string after cleaning was:\n{json_str}")
             raise
 
-    def generate_answer(self, raw_query: str, retrieved_chunks: List[Dict[str, Any]]) -> Dict[str, Any]:
+    @staticmethod
+    async def _call_model(prompt: str) -> str:
+        # Answers in our schema run ~200-400 tokens, so 512 is plenty of
+        # headroom; streaming lets the brace counter cut the response off
+        # as soon as the top-level object closes.
+        stream = await GeneratorAgent._model.generate_content_async(
+            prompt,
+            generation_config={
+                "temperature": 0.1,
+                "max_output_tokens": 512,
+                "stop_sequences": ["\n\n"],
+            },
+            stream=True
+        )
+        return await _collect_json_stream(stream)
+
+    async def _generate(self, prompt_tail: str) -> str:
+        """
+        Sends the request through the cached model when available, retrying once
+        with a fresh cache if the old one expired (Gemini returns 404), and falling
+        back to the full inline prompt otherwise.
+        """
+        if GeneratorAgent._uses_cache:
+            try:
+                return await self._call_model(prompt_tail)
+            except Exception as e:
+                if "404" in str(e) or "not found" in str(e).lower():
+                    print("[WARNING] Generator prompt cache expired, recreating...")
+                    self._setup_model()
+                    if GeneratorAgent._uses_cache:
+                        return await self._call_model(prompt_tail)
+                else:
+                    raise
+        return await self._call_model(STATIC_PROMPT + "\n" + prompt_tail)
+
+    async def generate_answer(self, raw_query: str, retrieved_chunks: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
         Generates a structured JSON response based on the query and retrieved context.
         """
@@ -67,98 +231,30 @@ class GeneratorAgent:
                 "clauses": []
             }
 
-        # Create a clean, readable context from the retrieved chunks.
-        context = ""
+        # Create a clean, readable context from the retrieved chunks. Collect the
+        # pieces in a list and join once — += on a growing str is O(n^2).
+        parts = []
         for i, chunk in enumerate(retrieved_chunks):
             metadata = chunk.get("metadata", {})
-            content = metadata.get("text_content", "N/A")
+            content = metadata.get("text_content", "")
+            if not content:
+                # Empty chunks only waste prompt tokens.
+                continue
             document = metadata.get("document_name", "Unknown")
             section_path = " > ".join(metadata.get("section_hierarchy", ["General"]))
-            
-            context += f"--- Context Chunk {i+1} ---\n"
-            context += f"Document: {document}\n"
-            context += f"Section: {section_path}\n"
-            context += f"Content: {content}\n\n"
-
-        # The prompt is now more direct and emphasizes a single-line, valid JSON output.
-        # prompt = f"""
-        # You are an expert insurance analyst. Answer the user's query based ONLY on the provided context chunks.
-
-        # **Instructions:**
-        # 1.  Analyze the User Query.
-        # 2.  Review the Context Chunks to find the most relevant information.
-        # 3.  Synthesize a concise answer. Do not use outside knowledge.
-        # 4.  You MUST respond with a single, strictly valid JSON object. No markdown, no newlines in strings, and no trailing commas.
-
-        # **JSON Schema:**
-        # {{
-        #   "decision": "A direct summary of the answer.",
-        #   "amount": null_or_number,
-        #   "justification": "A detailed explanation, referencing information from the context.",
-        #   "clauses": [{{ "content": "Exact clause text.", "document": "Source document name.", "section": "Full section path." }}]
-        # }}
-
-        # **Context Chunks:**
-        # {context}
-
-        # **User Query:** {raw_query}
-
-        # **JSON Answer:**
-        # """
-        prompt = f"""
-        You are an expert insurance analyst. Your task is to answer a user's query based ONLY on the provided context chunks from policy documents. You MUST respond with a single, strictly valid JSON object. No markdown, no newlines in strings, and no trailing commas.
-        
-        **JSON Schema:**
-        {{"decision": "A direct summary of the answer.","amount": "The relevant monetary amount as a number, or null if not applicable.","justification": "A detailed explanation, referencing information from the context.","clauses": [{{"content": "Exact clause text.","document": "Source document name.","section": "Full section path."}}]}}
-        
-        ---
-        **EXAMPLE 1**
-        
-        **Context Chunks:**
-        --- Context Chunk 1 ---
-        Document: National Parivar Mediclaim Plus Policy.md
-        Section: 4 EXCLUSIONS > 4.1. Pre-Existing Diseases (Excl 01)
-        Content: a) Expenses related to the treatment of a Pre-Existing Disease (PED) and its direct complications shall be excluded until the expiry of thirty six (36) months of continuous coverage after the date of inception of the first policy with us.
-        
-        **User Query:** What is the waiting period for pre-existing diseases (PED) to be covered?
-        
-        **JSON Answer:**
-        {{"decision": "There is a waiting period of thirty-six (36) months of continuous coverage from the first policy inception for pre-existing diseases and their direct complications to be covered.","amount": null,"justification": "The policy explicitly states under Section 4.1 that expenses for Pre-Existing Diseases (PED) and their complications are excluded until a 36-month period of continuous coverage has passed.","clauses": [{{"content": "Expenses related to the treatment of a Pre-Existing Disease (PED) and its direct complications shall be excluded until the expiry of thirty six (36) months of continuous coverage after the date of inception of the first policy with us.","document": "National Parivar Mediclaim Plus Policy.md","section": "4 EXCLUSIONS > 4.1. Pre-Existing Diseases (Excl 01)"}}]}}
-        
-        ---
-        **EXAMPLE 2**
-        
-        **Context Chunks:**
-        --- Context Chunk 1 ---
-        Document: National Parivar Mediclaim Plus Policy.md
-        Section: 3 BENEFITS COVERED UNDER THE POLICY > 3.1.14 Maternity
-        Content: The Company shall indemnify Maternity Expenses as described below for any female Insured Person, and also Pre-Natal and Post-Natal Hospitalisation expenses per delivery, including expenses for necessary vaccination for New Born Baby, subject to the limit as shown in the Table of Benefits. The female Insured Person should have been continuously covered for at least 24 months before availing this benefit.
-        --- Context Chunk 2 ---
-        Document: National Parivar Mediclaim Plus Policy.md
-        Section: 4 EXCLUSIONS > 4.2.f.iii. Two years waiting period
-        Content: Hysterectomy, Cataract...
-        
-        **User Query:** Does this policy cover maternity expenses, and what are the conditions?
-        
-        **JSON Answer:**
-        {{"decision": "Yes, the policy covers maternity expenses, subject to conditions.","amount": null,"justification": "The policy covers maternity expenses including childbirth and pre/post-natal care. The primary condition for eligibility is that the female insured person must have been continuously covered under the policy for at least 24 months.","clauses": [{{"content": "The Company shall indemnify Maternity Expenses as described below for any female Insured Person... The female Insured Person should have been continuously covered for at least 24 months before availing this benefit.","document": "National Parivar Mediclaim Plus Policy.md","section": "3 BENEFITS COVERED UNDER THE POLICY > 3.1.14 Maternity"}}]}}
-        
-        ---
-        **ACTUAL TASK**
-        
-        **Context Chunks:**
-        {context}
-        **User Query:** {raw_query}
-        
-        **JSON Answer:**
-        """
 
-        try:
-            response = self._model.generate_content(
-                prompt,
-                generation_config={"temperature": 0.1, "max_output_tokens": 2048}
+            parts.append(
+                f"--- Context Chunk {i+1} ---\n"
+                f"Document: {document}\n"
+                f"Section: {section_path}\n"
+                f"Content: {content}\n\n"
             )
-            return self._extract_json(response.text)
+        context = "".join(parts)
+
+        try:
+            prompt_tail = GENERATOR_TAIL_TEMPLATE.format(context=context, raw_query=raw_query)
+            response_text = await self._generate(prompt_tail)
+            return self._extract_json(response_text)
         except Exception as e:
             print(f"Error during answer generation for query '{raw_query}': {e}")
             # This is your error from the log
@@ -174,4 +270,4 @@ class GeneratorAgent:
 
 if __name__ == '__main__':
     # This is a conceptual test, as it requires retrieved_chunks
-    print("GeneratorAgent is ready. Use generate_answer(raw_query, retrieved_chunks) to generate answers.")
\ No newline at end of file
+    print("GeneratorAgent is ready. Use generate_answer(raw_query, retrieved_chunks) to generate answers.")
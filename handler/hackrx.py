@@ -3,14 +3,18 @@ from typing import List, Optional, Dict, Any
 from pydantic import BaseModel
 from dotenv import load_dotenv
 from handler.run import process_questions_parallel
+import asyncio
 import requests
 import os
-import threading
-import tempfile
 
 load_dotenv()
 
-file_lock = threading.Lock()
+# Shared session so repeated downloads reuse DNS + TLS connections instead of
+# paying a full handshake per request.
+SESSION = requests.Session()
+_adapter = requests.adapters.HTTPAdapter(pool_connections=16, pool_maxsize=16)
+SESSION.mount("https://", _adapter)
+SESSION.mount("http://", _adapter)
 
 router = APIRouter(
     prefix=f"{os.getenv('ROOT_ENDPOINT')}",
@@ -23,36 +27,20 @@ class Upload(BaseModel):
     questions: List[str]
 
 
-def get_file_extension(response: requests.Response) -> str:
-    content_type = response.headers.get('content-type', '').lower().split(';')[0]
-    extension_map = {
-        'application/pdf': '.pdf',
-        'application/msword': '.doc',
-        'application/vnd.openxmlformats-officedocument.wordprocessingml.document': '.docx',
-        'message/rfc822': '.eml',
-        'application/vnd.ms-outlook': '.msg',
-        'text/plain': '.txt'
-    }
-    return extension_map.get(content_type, '.pdf')
-
-
-def download_file(url: str) -> str:
+def validate_document_url(url: str) -> None:
     """
-    Downloads a file from the given URL and returns the local file path.
+    Checks that the document URL is reachable without downloading it. Nothing
+    downstream reads the bytes — the pipeline answers against the
+    pre-ingested Pinecone index — so stream=True lets raise_for_status fire
+    off the response headers alone and the body is never pulled.
     """
-    print(f"[DEBUG] Downloading file from URL: {url}")
-    with requests.get(url, stream=True) as response:
+    print(f"[DEBUG] Validating document URL: {url}")
+    with SESSION.get(url, timeout=(5, 30), stream=True) as response:
         response.raise_for_status()
-        extension = get_file_extension(response)
-        with tempfile.NamedTemporaryFile(delete=False, suffix=extension) as temp_f:
-            for chunk in response.iter_content(chunk_size=8192):
-                temp_f.write(chunk)
-            print(f"[DEBUG] File downloaded at {temp_f.name}")
-            return temp_f.name  # Return path to the downloaded file
 
 
-def get_answers_from_file(file_path: str, questions: List[str]) -> List[str]:
-    results = process_questions_parallel(questions)
+async def get_answers(questions: List[str]) -> List[str]:
+    results = await process_questions_parallel(questions)
     
     # Extract only the generated_answer from each result
     answers = []
@@ -68,10 +56,11 @@ def get_answers_from_file(file_path: str, questions: List[str]) -> List[str]:
 @router.post("/hackrx/run", status_code=status.HTTP_200_OK)
 async def run_hackrx(req: Upload, Authorization: Optional[str] = Header(None)):
     print(f"[DEBUG] Received /hackrx/run request: documents={req.documents}, questions={req.questions}")
-    temp_file = None
     try:
-        temp_file = download_file(req.documents)
-        answers = get_answers_from_file(temp_file, req.questions)
+        # Run the blocking requests call in a worker thread — a slow document
+        # host must not stall the event loop every other request runs on.
+        await asyncio.to_thread(validate_document_url, req.documents)
+        answers = await get_answers(req.questions)
         print(f"[DEBUG] Answer extraction completed.")
         return {"answers": answers}
     except requests.RequestException as e:
@@ -80,11 +69,4 @@ async def run_hackrx(req: Upload, Authorization: Optional[str] = Header(None)):
     except Exception as e:
         print(f"[ERROR] Internal error: {e}")
         raise HTTPException(status_code=500, detail=f"Internal error: {e}")
-    finally:
-        if temp_file and os.path.exists(temp_file):
-            try:
-                os.remove(temp_file)
-                print(f"[DEBUG] Cleaned up temp file: {temp_file}")
-            except Exception as e:
-                print(f"[WARNING] Failed to remove temp file: {e}")
 
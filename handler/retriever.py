@@ -88,19 +88,18 @@
 
 import os
 from typing import List, Dict, Any
+import numpy as np
+import torch
 from dotenv import load_dotenv
 from FlagEmbedding import BGEM3FlagModel
 from pinecone.grpc import PineconeGRPC as Pinecone
 from handler.query_enhancer import EnhancedQuery
 
-def hybrid_score_norm(dense, sparse, alpha: float):
+def hybrid_score_norm(dense: np.ndarray, sparse_values: np.ndarray, alpha: float):
+    """Apply alpha weighting to dense/sparse scores with two SIMD multiplies."""
     if alpha < 0 or alpha > 1:
         raise ValueError("Alpha must be between 0 and 1")
-    hs = {
-        'indices': sparse['indices'],
-        'values':  [v * (1 - alpha) for v in sparse['values']]
-    }
-    return [v * alpha for v in dense], hs
+    return dense * alpha, sparse_values * (1 - alpha)
 
 class RetrieverAgent:
     _embedder = None
@@ -109,7 +108,9 @@ class RetrieverAgent:
 
     def __init__(self):
         if not RetrieverAgent._embedder:
-            RetrieverAgent._embedder = BGEM3FlagModel('BAAI/bge-m3', use_fp16=False)
+            # FP16 on GPU: halves activation bandwidth for ~2x encode throughput
+            # with negligible cosine drift; CPU stays FP32.
+            RetrieverAgent._embedder = BGEM3FlagModel('BAAI/bge-m3', use_fp16=torch.cuda.is_available())
         if not RetrieverAgent._pinecone_initialized:
             load_dotenv()
             api_key = os.getenv("PINECONE_API_KEY")
@@ -120,6 +121,36 @@ class RetrieverAgent:
             RetrieverAgent._namespace = namespace
             RetrieverAgent._pinecone_initialized = True
 
+    def embed_queries(self, texts: List[str]):
+        """Dense-only embeddings for a batch of raw query strings in one forward pass."""
+        # inference_mode skips autograd bookkeeping on every encode.
+        with torch.inference_mode():
+            result = RetrieverAgent._embedder.encode(texts, batch_size=len(texts), return_dense=True, return_sparse=False)
+        return list(result['dense_vecs'])
+
+    def encode_queries(self, search_queries: List[str]):
+        """
+        Batch-encodes all search queries in a single BGE-M3 forward pass and
+        returns one (dense, sparse_indices, sparse_values) tuple per query,
+        ready for retrieve_by_embedding. Batching amortizes tokenizer and
+        model-dispatch overhead across the whole request.
+        """
+        with torch.inference_mode():
+            result = RetrieverAgent._embedder.encode(
+                search_queries,
+                batch_size=len(search_queries),
+                return_dense=True,
+                return_sparse=True
+            )
+        encoded = []
+        for dense, lw in zip(result['dense_vecs'], result['lexical_weights']):
+            dense = np.asarray(dense, dtype=np.float32)
+            indices = np.fromiter(lw.keys(), dtype=np.int32, count=len(lw))
+            values = np.fromiter(lw.values(), dtype=np.float32, count=len(lw))
+            mask = values != 0
+            encoded.append((dense, indices[mask], values[mask]))
+        return encoded
+
     def _compose_search_query(self, enhanced_query: EnhancedQuery) -> str:
         parts = [enhanced_query.raw_query] + enhanced_query.entities
         if enhanced_query.keywords:
@@ -130,18 +161,18 @@ class RetrieverAgent:
 
     def retrieve_and_rerank(self, enhanced_query: EnhancedQuery, top_k_initial: int = 35, top_k_final: int = 5, alpha: float = 0.5) -> List[Dict[str, Any]]:
         search_query = self._compose_search_query(enhanced_query)
-        result = RetrieverAgent._embedder.encode([search_query], return_dense=True, return_sparse=True)
-        dense_emb = result['dense_vecs'][0]
-        lw = result['lexical_weights'][0]
-        indices = [int(idx) for idx, val in lw.items() if float(val) != 0.0]
-        values = [float(val) for idx, val in lw.items() if float(val) != 0.0]
-        sparse = {'indices': indices, 'values': values}
+        dense_emb, indices, values = self.encode_queries([search_query])[0]
+        return self.retrieve_by_embedding(dense_emb, indices, values, top_k_final=top_k_final, alpha=alpha)
+
+    def retrieve_by_embedding(self, dense_emb: np.ndarray, indices: np.ndarray, values: np.ndarray, top_k_final: int = 5, alpha: float = 0.5) -> List[Dict[str, Any]]:
+        """Queries Pinecone with a pre-computed hybrid embedding (see encode_queries)."""
         # Apply alpha weighting if desired
-        hdense, hsparse = hybrid_score_norm(dense_emb, sparse, alpha)
+        hdense, hvalues = hybrid_score_norm(dense_emb, values, alpha)
         try:
             results = RetrieverAgent._index.query(
-                vector=hdense,
-                sparse_vector=hsparse,
+                # PineconeGRPC expects plain Python lists at the client boundary.
+                vector=hdense.tolist(),
+                sparse_vector={'indices': indices.tolist(), 'values': hvalues.tolist()},
                 top_k=top_k_final,
                 namespace=RetrieverAgent._namespace,
                 include_metadata=True
@@ -151,13 +182,9 @@ class RetrieverAgent:
             return []
         if not results:
             return []
-        seen_ids = set()
-        unique_results = []
-        for res in results:
-            chunk_id = res.get("id")
-            if chunk_id not in seen_ids:
-                unique_results.append(res)
-                seen_ids.add(chunk_id)
+        # One C-level pass, insertion-ordered; Pinecone already returns unique
+        # IDs per namespace so this is just a cheap safety net.
+        unique_results = list({res.get("id"): res for res in results}.values())
         # Return results with Pinecone scores instead of reranking scores
         final_results = []
         for res in unique_results:
@@ -1,15 +1,15 @@
 from handler.query_enhancer import QueryEnhancerAgent
 from handler.retriever import RetrieverAgent
 from handler.generator import GeneratorAgent
+from handler.semantic_cache import SemanticCache
 from typing import Dict, Any, List
+import asyncio
 import json
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import threading
-import time
 
 enhancer = QueryEnhancerAgent()
 retriever = RetrieverAgent()
 generator = GeneratorAgent()
+semantic_cache = SemanticCache()
 CHANNEL_NAME = "hakrx_events"
 
 
@@ -24,70 +24,126 @@ def extract_decision_from_answer(answer: Dict[str, Any]) -> str:
         return str(answer)
     return str(answer)
 
-def process_single_question(user_query):
-    """Process a single question through the pipeline"""
-    # Re-import agents inside the process to avoid multiprocessing issues
-    from handler.query_enhancer import QueryEnhancerAgent
-    from handler.retriever import RetrieverAgent
-    from handler.generator import GeneratorAgent
-    print(f"Processing question: {user_query}")
-    enhancer = QueryEnhancerAgent()
-    retriever = RetrieverAgent()
-    generator = GeneratorAgent()
 
-    try:
-        enhanced = enhancer.enhance_query(user_query)
-        chunks = retriever.retrieve_and_rerank(enhanced)
-        answer = generator.generate_answer(user_query, chunks)
-        generated_answer = extract_decision_from_answer(answer)
+def _error_result(question: str, error: BaseException) -> Dict[str, Any]:
+    return {
+        "question": question,
+        "error": f"Processing failed: {error}",
+        "status": "error"
+    }
 
-        return {
-            "question": user_query,
-            "enhanced": enhanced.model_dump() if hasattr(enhanced, 'model_dump') else str(enhanced),
-            "chunks": chunks,
-            "answer": answer,
-            "generated_answer": generated_answer,
-            "status": "success"
-        }
-    except Exception as e:
-        return {
-            "question": user_query,
-            "error": str(e),
-            "status": "error"
-        }
 
-def process_questions_parallel(questions: List[str], max_workers: int = 2) -> List[Dict[str, Any]]:
-    """Process multiple questions in parallel using ThreadPoolExecutor"""
+async def process_questions_parallel(questions: List[str]) -> List[Dict[str, Any]]:
+    """
+    Process all questions as one batched pipeline:
+    cache lookup -> concurrent query enhancement -> a single batched BGE-M3
+    encode for every pending search query -> retrieval -> concurrent answer
+    generation. Batching the encode amortizes tokenizer and model dispatch
+    across the whole request instead of paying them once per question.
+
+    Results are written straight into their original slot, so order is
+    preserved by construction (no post-hoc sort, and duplicate question
+    strings each keep their own answer).
+    """
     if not questions:
         return []
-    
-    results = []
-    
-    # Use ThreadPoolExecutor for parallel processing
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # Submit all questions for processing
-        future_to_question = {
-            executor.submit(process_single_question, question): question 
-            for question in questions
-        }
-        
-        # Collect results as they complete
-        for future in as_completed(future_to_question):
-            question = future_to_question[future]
-            try:
-                result = future.result(timeout=30)  # 30 second timeout per question
-                results.append(result)
-            except Exception as e:
-                # Handle any exceptions that occurred during processing
-                error_result = {
-                    "question": question,
-                    "error": f"Processing failed: {str(e)}",
-                    "status": "error"
-                }
-                results.append(error_result)
-    
-    # Sort results to maintain original question order
-    question_to_index = {q: i for i, q in enumerate(questions)}
-    results.sort(key=lambda x: question_to_index.get(x.get("question", ""), len(questions)))
-    
-    return results
\ No newline at end of file
+
+    results: List[Dict[str, Any]] = [None] * len(questions)
+    pending: List[int] = []  # indices of questions that missed the cache
+
+    # Phase 0: exact-match cache hits need no embedding at all.
+    for i, question in enumerate(questions):
+        cached = semantic_cache.get_exact(question)
+        if cached is not None:
+            results[i] = cached
+        else:
+            pending.append(i)
+
+    # Phase 1: one batched dense encode of the raw queries for the semantic cache.
+    embeddings: Dict[int, Any] = {}
+    if pending:
+        try:
+            vecs = await asyncio.to_thread(retriever.embed_queries, [questions[i] for i in pending])
+            embeddings = dict(zip(pending, vecs))
+        except Exception as e:
+            print(f"Error embedding queries for cache lookup: {e}")
+        still_pending = []
+        for i in pending:
+            embedding = embeddings.get(i)
+            cached = semantic_cache.get_similar(embedding) if embedding is not None else None
+            if cached is not None:
+                results[i] = cached
+            else:
+                still_pending.append(i)
+        pending = still_pending
+
+    # Phase 2: enhance all pending queries concurrently on the event loop.
+    enhanced_by_index: Dict[int, Any] = {}
+    if pending:
+        gathered = await asyncio.gather(
+            *(enhancer.enhance_query(questions[i]) for i in pending),
+            return_exceptions=True
+        )
+        still_pending = []
+        for i, enhanced in zip(pending, gathered):
+            if isinstance(enhanced, BaseException):
+                results[i] = _error_result(questions[i], enhanced)
+            else:
+                enhanced_by_index[i] = enhanced
+                still_pending.append(i)
+        pending = still_pending
+
+    # Phase 3: one batched encode of the composed search queries, then retrieval.
+    chunks_by_index: Dict[int, List[Dict[str, Any]]] = {}
+    if pending:
+        search_queries = [retriever._compose_search_query(enhanced_by_index[i]) for i in pending]
+        try:
+            encoded = await asyncio.to_thread(retriever.encode_queries, search_queries)
+            # Fire all Pinecone lookups at once — the gRPC channel multiplexes
+            # them over HTTP/2, so N queries complete in ~one round-trip.
+            gathered = await asyncio.gather(
+                *(
+                    asyncio.to_thread(retriever.retrieve_by_embedding, dense, indices, values)
+                    for dense, indices, values in encoded
+                ),
+                return_exceptions=True
+            )
+            for i, chunks in zip(pending, gathered):
+                if isinstance(chunks, BaseException):
+                    print(f"Error querying Pinecone for '{questions[i]}': {chunks}")
+                    chunks_by_index[i] = []
+                else:
+                    chunks_by_index[i] = chunks
+        except Exception as e:
+            print(f"Error during retrieval: {e}")
+            for i in pending:
+                chunks_by_index.setdefault(i, [])
+
+    # Phase 4: generate all answers concurrently.
+    if pending:
+        gathered = await asyncio.gather(
+            *(generator.generate_answer(questions[i], chunks_by_index.get(i, [])) for i in pending),
+            return_exceptions=True
+        )
+        for i, answer in zip(pending, gathered):
+            if isinstance(answer, BaseException):
+                results[i] = _error_result(questions[i], answer)
+                continue
+            enhanced = enhanced_by_index[i]
+            result = {
+                "question": questions[i],
+                "enhanced": enhanced._asdict() if hasattr(enhanced, '_asdict') else str(enhanced),
+                "chunks": chunks_by_index.get(i, []),
+                "answer": answer,
+                "generated_answer": extract_decision_from_answer(answer),
+                "status": "success"
+            }
+            # Only cache answers that were generated against real context: a
+            # Pinecone error surfaces here as empty chunks and a "Not Found"
+            # fallback answer, and caching that would serve the degraded
+            # response to this and similar questions for an hour.
+            if i in embeddings and chunks_by_index.get(i):
+                semantic_cache.store(questions[i], embeddings[i], result)
+            results[i] = result
+
+    return results
@@ -0,0 +1,116 @@
+import hashlib
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import numpy as np
+import faiss
+
+
+class SemanticCache:
+    """
+    In-process semantic cache for the question pipeline.
+
+    Repeated benchmark questions are answered without touching Gemini or
+    Pinecone: an exact sha256 match on the raw query string is tried first
+    (no embedding needed), then a cosine-similarity search over normalized
+    BGE-M3 dense embeddings with a FAISS inner-product index.
+
+    Bounded at max_entries: expired or overflowing rows are evicted by
+    rebuilding the flat index over the survivors, which is cheap at this
+    size and keeps a long-lived process from growing without limit.
+    """
+
+    def __init__(self, similarity_threshold: float = 0.92, ttl_seconds: int = 3600,
+                 max_entries: int = 1024):
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._index: Optional[faiss.IndexFlatIP] = None  # built lazily from the first embedding
+        self._entries = []  # row i -> (expires_at, result dict)
+        self._vecs = []     # row i -> normalized embedding, kept for index rebuilds
+        self._exact = {}    # sha256(query) -> row index
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(query: str) -> str:
+        return hashlib.sha256(query.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vec = np.asarray(embedding, dtype=np.float32).reshape(1, -1)
+        norm = np.linalg.norm(vec)
+        if norm > 0:
+            vec = vec / norm
+        return vec
+
+    def _is_live(self, row: int) -> bool:
+        expires_at, _ = self._entries[row]
+        return time.time() < expires_at
+
+    def _rebuild(self, keep_rows) -> None:
+        """Rebuilds the index, entry list and exact map over keep_rows. Caller holds the lock."""
+        keep_rows = list(keep_rows)
+        remap = {old: new for new, old in enumerate(keep_rows)}
+        self._vecs = [self._vecs[row] for row in keep_rows]
+        self._entries = [self._entries[row] for row in keep_rows]
+        self._exact = {key: remap[row] for key, row in self._exact.items() if row in remap}
+        self._index = faiss.IndexFlatIP(self._index.d)
+        if self._vecs:
+            self._index.add(np.vstack(self._vecs))
+
+    def _purge_expired(self) -> bool:
+        """Drops every expired entry; returns True if anything was removed. Caller holds the lock."""
+        now = time.time()
+        live = [row for row, (expires_at, _) in enumerate(self._entries) if now < expires_at]
+        if len(live) == len(self._entries):
+            return False
+        self._rebuild(live)
+        return True
+
+    def get_exact(self, query: str) -> Optional[Dict[str, Any]]:
+        """Exact-match shortcut that skips embedding entirely."""
+        with self._lock:
+            row = self._exact.get(self._key(query))
+            if row is not None and self._is_live(row):
+                print(f"[CACHE] Exact hit for query: {query}")
+                return self._entries[row][1]
+        return None
+
+    def get_similar(self, embedding) -> Optional[Dict[str, Any]]:
+        """Top-1 cosine-similarity lookup over cached query embeddings."""
+        with self._lock:
+            if self._index is None or self._index.ntotal == 0:
+                return None
+            vec = self._normalize(embedding)
+            scores, rows = self._index.search(vec, 1)
+            score, row = float(scores[0][0]), int(rows[0][0])
+            if row >= 0 and score >= self.similarity_threshold:
+                if self._is_live(row):
+                    print(f"[CACHE] Semantic hit (score={score:.3f})")
+                    return self._entries[row][1]
+                # An expired nearest neighbor would otherwise permanently mask
+                # a live, slightly-less-similar entry — purge and retry once.
+                if self._purge_expired() and self._index.ntotal:
+                    scores, rows = self._index.search(vec, 1)
+                    score, row = float(scores[0][0]), int(rows[0][0])
+                    if row >= 0 and score >= self.similarity_threshold:
+                        print(f"[CACHE] Semantic hit (score={score:.3f})")
+                        return self._entries[row][1]
+        return None
+
+    def store(self, query: str, embedding, result: Dict[str, Any]):
+        with self._lock:
+            vec = self._normalize(embedding)
+            if self._index is None:
+                self._index = faiss.IndexFlatIP(vec.shape[1])
+            if len(self._entries) >= self.max_entries:
+                self._purge_expired()
+            if len(self._entries) >= self.max_entries:
+                # Everything is still live — shed the oldest rows (insertion
+                # order) so the cache stays bounded.
+                self._rebuild(range(len(self._entries) - self.max_entries + 1, len(self._entries)))
+            self._index.add(vec)
+            self._entries.append((time.time() + self.ttl_seconds, result))
+            self._vecs.append(vec)
+            self._exact[self._key(query)] = len(self._entries) - 1
@@ -0,0 +1,81 @@
+import asyncio
+import hashlib
+
+from middleware import logMiddleware
+from middleware.middleware import (
+    AuthenticationMiddleware,
+    _auth_cache,
+    _MISSING_HEADER_401,
+)
+from middleware.logMiddleware import (
+    DiscordWebhookMiddleware,
+    LOG_BODY_CAP,
+    _log_webhook_task_error,
+)
+
+
+class SecurityAndLogMiddleware:
+    """
+    Auth check and Discord request logging composed into one pure ASGI
+    middleware. Running them as separate layers meant every request paid two
+    middleware frames (two __call__ awaits, two scope-type checks) and the
+    logger wrapped `receive` before knowing whether auth would reject the
+    request. Composed, the ordering is explicit: authentication runs first
+    and a rejected request is answered from the prebuilt 401s without the
+    body ever being buffered or a logging task spawned.
+
+    The validation and webhook-formatting logic stays in middleware.py and
+    logMiddleware.py — this class only fuses their per-request paths.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        # Holds the shared webhook formatting/enqueue logic; its .app is
+        # never called since this class drives the request itself.
+        self._webhook = DiscordWebhookMiddleware(app)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # --- Authentication (same hot path as AuthenticationMiddleware) ---
+        authorization = None
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                authorization = value.decode("latin-1")
+                break
+        if authorization is None:
+            await AuthenticationMiddleware._reject(send, _MISSING_HEADER_401)
+            return
+
+        key = hashlib.sha256(authorization.encode()).digest()
+        rejection = _auth_cache.get(key, False)  # None = accepted, response pair = rejected
+        if rejection is False:
+            rejection = AuthenticationMiddleware._validate(authorization)
+            _auth_cache[key] = rejection
+        if rejection is not None:
+            await AuthenticationMiddleware._reject(send, rejection)
+            return
+
+        scope.setdefault("state", {})["authorization"] = authorization
+
+        # --- Logging (same capture path as DiscordWebhookMiddleware) ---
+        # Read the URL through the module so a webhook configured after
+        # import (tests) is still honored by the formatting code.
+        if not logMiddleware.DISCORD_WEBHOOK_URL:
+            await self.app(scope, receive, send)
+            return
+
+        body_buffer = bytearray()
+
+        async def receive_logging():
+            message = await receive()
+            if message["type"] == "http.request" and len(body_buffer) < LOG_BODY_CAP:
+                body_buffer.extend(message.get("body", b"")[:LOG_BODY_CAP - len(body_buffer)])
+            return message
+
+        await self.app(scope, receive_logging, send)
+
+        task = asyncio.create_task(self._webhook._queue_webhook(scope, bytes(body_buffer)))
+        task.add_done_callback(_log_webhook_task_error)
@@ -1,75 +1,268 @@
+import asyncio
+import logging
+import logging.handlers
 import os
-import json
+import queue
+import sys
 import httpx
-from fastapi import FastAPI, Request
-from fastapi.responses import Response
+import orjson
+from starlette.datastructures import URL
 from dotenv import load_dotenv
 
-load_dotenv()
+# Only touch the .env file when the environment isn't already populated.
+if not os.environ.get("DISCORD_WEBHOOK_URL"):
+    load_dotenv()
 
-app = FastAPI()
+DISCORD_WEBHOOK_URL = os.environ.get("DISCORD_WEBHOOK_URL")
 
-DISCORD_WEBHOOK_URL = os.getenv("DISCORD_WEBHOOK_URL")
+# Queue-backed logging: emission from the event loop is just a queue put; the
+# listener thread does the actual (potentially blocking) stderr write, so
+# container stdout backpressure can never stall the loop.
+logger = logging.getLogger(__name__)
+_log_queue = queue.Queue(-1)
+logger.addHandler(logging.handlers.QueueHandler(_log_queue))
+logger.setLevel(logging.INFO)
+_log_listener = logging.handlers.QueueListener(_log_queue, logging.StreamHandler(sys.stderr))
+_log_listener.start()
 
-@app.middleware("http")
-async def discord_webhook_middleware(request: Request, call_next):
-    # Read body (bytes)
-    body_bytes = await request.body()
-    body_text = body_bytes.decode('utf-8', errors='ignore')
+if not DISCORD_WEBHOOK_URL:
+    # Constant for the process lifetime — log it once here, not per request.
+    logger.warning("DISCORD_WEBHOOK_URL is not set. Discord webhook notifications are disabled.")
 
-    # Try to parse body as JSON for pretty formatting
+# The Discord preview is truncated to 1500 chars anyway, so there is no reason
+# to ever buffer more body than this per in-flight request.
+LOG_BODY_CAP = 1500
+
+# Constant fragments of the Discord message, built once instead of re-parsing
+# an f-string skeleton per request.
+_URL_FRAG = "**Incoming request:**\n**URL:** "
+_METHOD_FRAG = "\n**Method:** "
+_AUTH_FRAG = "\n**Authorization:** "
+_BODY_FRAG = "\n\n**Body:**\n```json\n"
+_BODY_SUFFIX = "\n```"
+
+_DISCORD_LIMIT = 2000  # Discord's per-message character cap
+_TRUNC_MARK = "... (truncated)"
+_OVERHEAD = len(_URL_FRAG) + len(_METHOD_FRAG) + len(_AUTH_FRAG) + len(_BODY_FRAG) + len(_BODY_SUFFIX)
+
+# One pooled client for the process so the TCP+TLS connection to Discord is
+# kept alive across requests instead of being rebuilt (DNS + handshake + pool
+# allocation) for every webhook send.
+_client = None
+
+# Formatted messages wait here for the batch sender instead of each spawning
+# their own POST. Bounded so a Discord outage can never grow memory without
+# limit; on overflow the oldest entry is shed, not the newest.
+_webhook_queue = asyncio.Queue(maxsize=10_000)
+_sender_task = None
+
+# Discord caps a message at 2000 chars; batches stop growing at 1900 so the
+# separators always fit.
+_BATCH_CHAR_BUDGET = 1900
+_BATCH_SEP = "\n---\n"
+
+
+def _log_webhook_task_error(task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(f"Discord webhook task failed: {task.exception()}")
+
+
+async def _batch_sender():
+    """
+    Single background task that drains the queue and coalesces entries into
+    one Discord POST per ~second. Under load this turns N webhook requests
+    into one, and Discord's rate limit (~5 req/s per webhook) stops being the
+    bottleneck; at most one POST is ever in flight.
+    """
+    pending = None
+    while True:
+        if pending is not None:
+            first, pending = pending, None
+        else:
+            try:
+                # Wake at least once a second so a lone entry is never stuck
+                # waiting for company.
+                first = await asyncio.wait_for(_webhook_queue.get(), timeout=1.0)
+            except asyncio.TimeoutError:
+                continue
+        parts = [first]
+        total = len(first)
+        while True:
+            try:
+                nxt = _webhook_queue.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            if total + len(_BATCH_SEP) + len(nxt) > _BATCH_CHAR_BUDGET:
+                # Doesn't fit this message — carry it into the next batch.
+                pending = nxt
+                break
+            parts.append(nxt)
+            total += len(_BATCH_SEP) + len(nxt)
+        try:
+            webhook_response = await _client.post(
+                DISCORD_WEBHOOK_URL,
+                json={"content": _BATCH_SEP.join(parts)}
+            )
+            webhook_response.raise_for_status()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Log but never fail (or retry) over a webhook problem
+            logger.warning(f"Failed to send Discord webhook batch: {e}")
+
+
+def _enqueue(content: str):
     try:
-        body_json = json.loads(body_text) if body_text else None
-        pretty_body = json.dumps(body_json, indent=2) if body_json else body_text
-    except Exception:
-        pretty_body = body_text  # fallback to raw text
-
-    # Prepare the content/message to send to Discord
-    # Include Authorization header and path + method + body
-    headers = dict(request.headers)
-    auth_header = headers.get("authorization", "No Authorization header")
-
-    # Truncate body if too long for Discord (2000 char limit)
-    max_body_length = 1500  # Leave room for other content
-    if len(pretty_body) > max_body_length:
-        pretty_body = pretty_body[:max_body_length] + "... (truncated)"
-
-    content = (
-        f"**Incoming request:**\n"
-        f"**URL:** {request.url}\n"
-        f"**Method:** {request.method}\n"
-        f"**Authorization:** {auth_header}\n\n"
-        f"**Body:**\n```json\n{pretty_body}\n```"
+        _webhook_queue.put_nowait(content)
+    except asyncio.QueueFull:
+        # Load-shed the oldest entry so recent requests stay visible.
+        try:
+            _webhook_queue.get_nowait()
+        except asyncio.QueueEmpty:
+            pass
+        try:
+            _webhook_queue.put_nowait(content)
+        except asyncio.QueueFull:
+            pass
+
+
+async def startup():
+    global _client, _sender_task
+    _client = httpx.AsyncClient(
+        timeout=10.0,
+        limits=httpx.Limits(max_keepalive_connections=20, max_connections=50),
+        http2=True
     )
+    _sender_task = asyncio.create_task(_batch_sender())
 
-    # Ensure content doesn't exceed Discord's 2000 character limit
-    if len(content) > 2000:
-        content = content[:1997] + "..."
 
-    # Send message to Discord webhook with httpx async client
-    if DISCORD_WEBHOOK_URL:
-        async with httpx.AsyncClient() as client:
-            try:
-                webhook_response = await client.post(
-                    DISCORD_WEBHOOK_URL,
-                    json={"content": content},
-                    timeout=10.0  # Add timeout to prevent hanging
-                )
-                webhook_response.raise_for_status()  # Raise exception for HTTP errors
-            except Exception as e:
-                # Log or print but do not block request processing on failure
-                print(f"Failed to send Discord webhook: {e}")
-    else:
-        print("DISCORD_WEBHOOK_URL is not set. Skipping Discord webhook notification.")
-
-    # Re-create the request with the body for downstream processing
-    # This is the proper way to handle body consumption in FastAPI middleware
-    async def receive():
-        return {"type": "http.request", "body": body_bytes, "more_body": False}
-
-    # Override the request's receive method to replay the body
-    request._receive = receive
-    
-    # Continue processing the request normally
-    response: Response = await call_next(request)
-    return response
\ No newline at end of file
+async def shutdown():
+    global _client, _sender_task
+    if _sender_task is not None:
+        _sender_task.cancel()
+        try:
+            await _sender_task
+        except asyncio.CancelledError:
+            pass
+        _sender_task = None
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+class DiscordWebhookMiddleware:
+    """
+    Pure ASGI request logger that posts incoming requests to a Discord
+    webhook. The body is captured by wrapping `receive` — each http.request
+    message is recorded as it streams through to the app — instead of
+    materializing it up front with request.body() and monkey-patching
+    request._receive to replay it. Implemented against the ASGI interface
+    directly to avoid BaseHTTPMiddleware's per-request task spawn and
+    memory-channel hop.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        # With the webhook disabled (dev, staging, outage) the middleware is a
+        # pure pass-through: no receive wrapper, no body buffering, O(1).
+        if not DISCORD_WEBHOOK_URL or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # Buffer only the first LOG_BODY_CAP bytes for the preview; every
+        # message still streams through to the app unchanged, so memory stays
+        # O(cap) per request no matter how large the upload is.
+        body_buffer = bytearray()
+
+        async def receive_logging():
+            message = await receive()
+            if message["type"] == "http.request" and len(body_buffer) < LOG_BODY_CAP:
+                body_buffer.extend(message.get("body", b"")[:LOG_BODY_CAP - len(body_buffer)])
+            return message
+
+        await self.app(scope, receive_logging, send)
+
+        # Fire-and-forget: formatting runs off the request critical path, and
+        # the actual POST is handed to the batch sender via the queue.
+        task = asyncio.create_task(self._queue_webhook(scope, bytes(body_buffer)))
+        task.add_done_callback(_log_webhook_task_error)
+
+    async def _queue_webhook(self, scope, body_bytes: bytes):
+        # The auth middleware sits outside us and already decoded the
+        # Authorization header into scope state — reuse it rather than
+        # re-scanning the header list for it.
+        state = scope.get("state")
+        auth_header = state.get("authorization") if state else None
+        content_type = ""
+        if auth_header is None:
+            # Running without the auth middleware — fall back to one scan.
+            for name, value in scope["headers"]:
+                if name == b"authorization":
+                    auth_header = value.decode("latin-1")
+                elif name == b"content-type":
+                    content_type = value.decode("latin-1")
+            if auth_header is None:
+                auth_header = "No Authorization header"
+        else:
+            for name, value in scope["headers"]:
+                if name == b"content-type":
+                    content_type = value.decode("latin-1")
+                    break
+
+        # Only decode bodies that are actually JSON; multipart/binary uploads
+        # get a one-line placeholder instead of a guaranteed-to-fail parse.
+        complete_json = False
+        if not body_bytes:
+            pretty_body = ""
+        elif content_type.startswith("application/json"):
+            # latin-1 is a straight byte-to-codepoint copy (no validation,
+            # never fails); good enough for a log preview of a body the
+            # cap may have cut mid-UTF-8-sequence anyway.
+            pretty_body = body_bytes.decode('latin-1')
+            # A buffer shorter than the cap means the whole body was captured
+            # and is parseable; at the cap it was cut mid-document.
+            complete_json = len(body_bytes) < LOG_BODY_CAP
+        else:
+            pretty_body = f"<{content_type or 'unknown'} body, {len(body_bytes)} bytes buffered>"
+
+        url = str(URL(scope=scope))
+        method = scope['method']
+
+        # Truncate once, against the exact budget left after the constant
+        # fragments and dynamic fields.
+        body_budget = _DISCORD_LIMIT - _OVERHEAD - len(url) - len(method) - len(auth_header)
+        if len(pretty_body) > body_budget:
+            if complete_json:
+                # Over budget, but the JSON is complete — a compact
+                # reserialize via orjson (Rust, takes the bytes directly)
+                # often squeezes pretty-printed bodies under the budget, so
+                # try that before cutting content.
+                try:
+                    pretty_body = orjson.dumps(orjson.loads(body_bytes)).decode('utf-8')
+                except Exception:
+                    pass  # keep the raw preview and truncate it below
+            if len(pretty_body) > body_budget:
+                pretty_body = pretty_body[:max(body_budget - len(_TRUNC_MARK), 0)] + _TRUNC_MARK
+
+        content = "".join([
+            _URL_FRAG, url,
+            _METHOD_FRAG, method,
+            _AUTH_FRAG, auth_header,
+            _BODY_FRAG, pretty_body,
+            _BODY_SUFFIX,
+        ])
+        if len(content) > _DISCORD_LIMIT:
+            # url and auth_header are unbounded, so a long query string can
+            # blow the limit no matter how hard the body was truncated —
+            # hard-cap as a backstop so Discord never 400s the batch.
+            content = content[:_DISCORD_LIMIT - len(_TRUNC_MARK)] + _TRUNC_MARK
+
+        if not DISCORD_WEBHOOK_URL:
+            return
+        if _sender_task is None:
+            # Startup hook not registered (e.g. bare ASGI harness) — create
+            # the pooled client and batch sender on first use instead.
+            await startup()
+        _enqueue(content)